@@ -1,3 +1,9 @@
+import datetime
+import hashlib
+import os
+import time
+import uuid
+from collections import OrderedDict
 import streamlit as st
 import pandas as pd
 import numpy as np
@@ -21,50 +27,295 @@ st.set_page_config(
 st.title("San Jose Crash Data Analysis")
 st.markdown("Traffic accident analysis for the City of San Jose")
 
+# Pre-aggregated crash counts (see sql/mv_crash_agg.sql)
+CRASH_AGG_TABLE = "`datamining-assign.crash_data.mv_crash_agg`"
+
+# Per-intersection totals by year and severity (see sql/top_intersections_by_year_sev.sql)
+TOP_INTERSECTIONS_TABLE = "`datamining-assign.crash_data.top_intersections_by_year_sev`"
+
+# Only intersections ranked this high in some selected year/severity are
+# considered for the overall top 10
+TOP_INTERSECTION_CANDIDATE_RANK = 50
+
+# How long a submitted query job is reused across reruns and sessions
+QUERY_JOB_TTL = 3600  # seconds
+
+# Columns kept for each filtered result set
+RESULT_COLUMNS = {
+    'intersection': ['INTASTREETNAME', 'INTBSTREETNAME', 'crash_count'],
+    'fine': ['MONTHNAME', 'DAYOFWEEKNAME', 'HOUR', 'crash_count']
+}
+
+# Number of computed nodes kept per session, and for how long
+NODE_CACHE_SIZE = 32
+NODE_CACHE_TTL = 3600  # seconds
+
+# Arrow-backed pandas string dtype used for all string columns
+STRING_DTYPE = pd.StringDtype('pyarrow')
+
+# Query results persisted across sessions and app restarts
+DISK_CACHE_DIR = "/tmp/bqcache"
+DISK_CACHE_TTL = 3600  # seconds
+
 # Function to authenticate and create BigQuery client
+@st.cache_resource  # Reuse one client and its credentials for the app
 def get_bigquery_client():
+    # Failures raise instead of returning None: st.cache_resource does not
+    # cache exceptions, so the next call retries authentication.
+    # Use the secrets from Streamlit
+    if "gcp_service_account" not in st.secrets:
+        raise RuntimeError("GCP credentials not found in secrets.")
+    
+    credentials = service_account.Credentials.from_service_account_info(
+        st.secrets["gcp_service_account"]
+    )
+    return bigquery.Client(
+        project='datamining-assign',
+        credentials=credentials
+    )
+
+# Function to get the submitted query jobs shared by all sessions, keyed
+# on the query text and its parameters
+@st.cache_resource
+def get_query_jobs():
+    return {}
+
+# Function to submit a query job without waiting for its results
+# params is a tuple of (name, type, value) parameters; tuple values are
+# bound as arrays
+def submit_query(query, params=()):
+    # Reuse a recent or in-flight job for the same query and parameters
+    query_jobs = get_query_jobs()
+    now = time.time()
+    for key, (submitted_at, _) in list(query_jobs.items()):
+        if now - submitted_at >= QUERY_JOB_TTL:
+            query_jobs.pop(key, None)
+    if (query, params) in query_jobs:
+        return query_jobs[(query, params)][1]
+    
     try:
-        # Use the secrets from Streamlit
-        if "gcp_service_account" in st.secrets:
-            credentials = service_account.Credentials.from_service_account_info(
-                st.secrets["gcp_service_account"]
-            )
-            client = bigquery.Client(
-                project='datamining-assign',
-                credentials=credentials
-            )
-            return client
-        else:
-            st.error("GCP credentials not found in secrets.")
-            return None
+        client = get_bigquery_client()
     except Exception as e:
-        st.error(f"Authentication error: {e}")
-        return None
+        raise RuntimeError(f"Authentication error: {e}") from e
+    
+    # Bind filter values as parameters instead of formatting them into the
+    # SQL text; identical filters reuse BigQuery's cached results
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ArrayQueryParameter(name, param_type, list(value))
+            if isinstance(value, tuple)
+            else bigquery.ScalarQueryParameter(name, param_type, value)
+            for name, param_type, value in params
+        ],
+        use_query_cache=True
+    )
+    query_job = client.query(query, job_config=job_config)
+    query_jobs[(query, params)] = (now, query_job)
+    return query_job
+
+# Function to forget a failed job so the next call submits the query again;
+# a newer job for the same key, submitted by another session, is kept
+def evict_query(query, params, query_job):
+    query_jobs = get_query_jobs()
+    entry = query_jobs.get((query, params))
+    if entry is not None and entry[1] is query_job:
+        query_jobs.pop((query, params), None)
+
+# Function to get the parquet cache file for a query and its parameters
+def disk_cache_path(query, params=()):
+    key = hashlib.blake2b(repr((query, params)).encode(), digest_size=16).hexdigest()
+    return os.path.join(DISK_CACHE_DIR, f"{key}.parquet")
+
+# Function to check whether a parquet cache file exists and is within its
+# TTL; an expired file is deleted so the cache directory does not grow
+def disk_cache_fresh(path):
+    try:
+        if time.time() - os.path.getmtime(path) < DISK_CACHE_TTL:
+            return True
+        os.remove(path)
+    except OSError:
+        pass  # Missing, or already removed by another session
+    return False
 
 # Function to load data from BigQuery
 @st.cache_data(ttl=3600)  # Cache data for 1 hour
-def load_bigquery_data(query):
-    client = get_bigquery_client()
-    if client is None:
-        return pd.DataFrame()
+def load_bigquery_data(query, params=(), dtypes=None, use_bqstorage=True):
+    # Serve results saved by an earlier session without touching BigQuery
+    path = disk_cache_path(query, params)
+    if disk_cache_fresh(path):
+        try:
+            data = pd.read_parquet(path)
+            # Parquet metadata only records "string", which reads back with
+            # python storage; restore the Arrow-backed dtype
+            string_columns = data.select_dtypes('string').columns
+            return data.astype({column: STRING_DTYPE for column in string_columns})
+        except Exception:
+            pass  # Unreadable cache file; fall back to BigQuery
     
+    query_job = None
     try:
-        return client.query(query).to_dataframe()
-    except Exception as e:
-        st.error(f"Error executing query: {e}")
-        return pd.DataFrame()
+        query_job = submit_query(query, params)
+        
+        # Stream results as Arrow batches through the BigQuery Storage API;
+        # small single-page results skip the Storage API setup overhead.
+        # Strings stay Arrow-backed instead of one Python object per cell.
+        data = query_job.result().to_dataframe(
+            create_bqstorage_client=use_bqstorage,
+            dtypes=dtypes,
+            string_dtype=STRING_DTYPE
+        )
+    except Exception:
+        # Raise instead of returning an empty frame so st.cache_data does
+        # not keep the failure; callers report the error
+        if query_job is not None:
+            evict_query(query, params, query_job)
+        raise
+    
+    # Write to a temporary file first so other sessions never read a
+    # partially written cache file; failing to cache is not an error
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.makedirs(DISK_CACHE_DIR, exist_ok=True)
+        data.to_parquet(tmp_path, compression='zstd')
+        os.replace(tmp_path, path)
+    except Exception:
+        # Don't leave a partial temporary file behind
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    return data
+
+# Function to load all filter-dependent result sets with a single BigQuery job
+@st.cache_data(ttl=3600)  # Cache data for 1 hour
+def load_all_filtered(where_clause, params):
+    # Each result set is tagged with a `kind` column and padded to a shared
+    # schema so they can be returned by one UNION ALL query; rows come back
+    # unordered and are sorted client-side
+    query = f"""
+    SELECT
+        'intersection' as kind,
+        INTASTREETNAME,
+        INTBSTREETNAME,
+        CAST(NULL AS STRING) as DAYOFWEEKNAME,
+        CAST(NULL AS STRING) as MONTHNAME,
+        CAST(NULL AS INT64) as HOUR,
+        SUM(crash_count) as crash_count
+    FROM {TOP_INTERSECTIONS_TABLE}
+    WHERE {where_clause}
+        -- Rank the candidate intersections on their full totals in one
+        -- streaming pass with APPROX_TOP_SUM, then count exactly for the 10
+        -- it returns
+        AND CONCAT(INTASTREETNAME, '|', INTBSTREETNAME) IN (
+            SELECT top_intersection.value
+            FROM UNNEST((
+                SELECT APPROX_TOP_SUM(CONCAT(INTASTREETNAME, '|', INTBSTREETNAME), crash_count, 10)
+                FROM {TOP_INTERSECTIONS_TABLE}
+                WHERE {where_clause}
+                    -- crash_rank only picks the candidates; their rows from
+                    -- every selected year/severity are summed
+                    AND CONCAT(INTASTREETNAME, '|', INTBSTREETNAME) IN (
+                        SELECT DISTINCT CONCAT(INTASTREETNAME, '|', INTBSTREETNAME)
+                        FROM {TOP_INTERSECTIONS_TABLE}
+                        WHERE {where_clause}
+                            AND crash_rank <= {TOP_INTERSECTION_CANDIDATE_RANK}
+                    )
+            )) as top_intersection
+        )
+    GROUP BY INTASTREETNAME, INTBSTREETNAME
+    UNION ALL
+    -- Hourly, day-hour and monthly totals are all derived client-side
+    -- from these at most 12 x 7 x 24 rows
+    SELECT 'fine', NULL, NULL, DAYOFWEEKNAME, MONTHNAME, HOUR, SUM(crash_count)
+    FROM {CRASH_AGG_TABLE}
+    WHERE {where_clause}
+    GROUP BY MONTHNAME, DAYOFWEEKNAME, HOUR
+    """
+    
+    data = load_bigquery_data(query, params, dtypes={'crash_count': 'int32'})
+    if data.empty:
+        return {kind: pd.DataFrame() for kind in RESULT_COLUMNS}
+    
+    # Split the combined result back into one DataFrame per section
+    return {
+        kind: data.loc[data['kind'] == kind, cols].reset_index(drop=True)
+        for kind, cols in RESULT_COLUMNS.items()
+    }
+
+# Function to load average locations for the given intersections; only
+# the map view needs them, so they are kept out of the combined query
+@st.cache_data(ttl=3600)  # Cache data for 1 hour
+def load_intersection_locations(where_clause, params, intersections):
+    query = f"""
+    SELECT
+        INTASTREETNAME,
+        INTBSTREETNAME,
+        SAFE_DIVIDE(SUM(latitude_sum), SUM(latitude_count)) as latitude,
+        SAFE_DIVIDE(SUM(longitude_sum), SUM(longitude_count)) as longitude
+    FROM {TOP_INTERSECTIONS_TABLE}
+    WHERE {where_clause}
+        AND CONCAT(INTASTREETNAME, '|', INTBSTREETNAME) IN UNNEST(@intersections)
+    GROUP BY INTASTREETNAME, INTBSTREETNAME
+    """
+    params = params + (('intersections', 'STRING', intersections),)
+    return load_bigquery_data(query, params, use_bqstorage=False)
+
+# Function to fingerprint a computation node from its definition
+def node_fingerprint(spec):
+    return hashlib.blake2b(repr(spec).encode(), digest_size=16).hexdigest()
+
+# Function to compute a node once and reuse it until it expires; the TTL
+# matches the data caches so a long-lived session picks up refreshed data
+def cached_node(spec, compute):
+    node_cache = st.session_state.setdefault('node_cache', OrderedDict())
+    key = node_fingerprint(spec)
+    now = time.time()
+    if key in node_cache:
+        computed_at, result = node_cache[key]
+        if now - computed_at < NODE_CACHE_TTL:
+            node_cache.move_to_end(key)
+            return result
+        del node_cache[key]
+    
+    # Failed loads raise before anything is stored, so they get retried
+    result = compute()
+    node_cache[key] = (now, result)
+    if len(node_cache) > NODE_CACHE_SIZE:
+        node_cache.popitem(last=False)
+    return result
 
 # Add interactive filters
 st.sidebar.header("Filters")
 
-# Load years for filtering
-years_query = """
-SELECT DISTINCT EXTRACT(YEAR FROM DATE) as year
-FROM `datamining-assign.crash_data.processed_crash_data`
+# Filter option queries
+years_query = f"""
+SELECT DISTINCT year
+FROM {CRASH_AGG_TABLE}
 ORDER BY year
 """
 
-years_data = load_bigquery_data(years_query)
+severity_query = f"""
+SELECT DISTINCT SEVERITY_CATEGORY 
+FROM {CRASH_AGG_TABLE}
+ORDER BY SEVERITY_CATEGORY
+"""
+
+# Submit the filter option queries up front so they run concurrently
+for query in (years_query, severity_query):
+    if disk_cache_fresh(disk_cache_path(query)):
+        continue  # Served from the parquet cache, no job needed
+    try:
+        submit_query(query)
+    except Exception:
+        pass  # Reported when the results are loaded below
+
+# Load years for filtering
+try:
+    years_data = load_bigquery_data(years_query, use_bqstorage=False)
+except Exception as e:
+    st.error(f"Error executing query: {e}")
+    years_data = pd.DataFrame()
 if not years_data.empty:
     years = years_data['year'].astype(int).tolist()
     selected_years = st.sidebar.multiselect(
@@ -77,13 +328,11 @@ else:
     st.sidebar.warning("Could not load year data")
 
 # Load severity categories for filtering
-severity_query = """
-SELECT DISTINCT SEVERITY_CATEGORY 
-FROM `datamining-assign.crash_data.processed_crash_data`
-ORDER BY SEVERITY_CATEGORY
-"""
-
-severity_data = load_bigquery_data(severity_query)
+try:
+    severity_data = load_bigquery_data(severity_query, use_bqstorage=False)
+except Exception as e:
+    st.error(f"Error executing query: {e}")
+    severity_data = pd.DataFrame()
 if not severity_data.empty:
     severities = severity_data['SEVERITY_CATEGORY'].tolist()
     selected_severities = st.sidebar.multiselect(
@@ -95,93 +344,133 @@ else:
     selected_severities = []
     st.sidebar.warning("Could not load severity data")
 
+# Canonical filter node: selection order does not change the result
+filter_years = tuple(sorted(selected_years))
+filter_severities = tuple(sorted(selected_severities))
+filter_spec = ('filter', filter_years, filter_severities)
+
 # Build WHERE clause for filters
 where_clauses = ["INTASTREETNAME IS NOT NULL AND INTBSTREETNAME IS NOT NULL"]
+query_params = []
 
-if selected_years:
-    years_str = ", ".join([str(year) for year in selected_years])
-    where_clauses.append(f"EXTRACT(YEAR FROM DATE) IN ({years_str})")
+if filter_years:
+    # The crash_year range lets BigQuery prune partitions; the year list
+    # keeps non-contiguous selections exact
+    where_clauses.append("crash_year BETWEEN @start_year AND @end_year AND year IN UNNEST(@years)")
+    query_params.append(('start_year', 'DATE', datetime.date(filter_years[0], 1, 1)))
+    query_params.append(('end_year', 'DATE', datetime.date(filter_years[-1], 1, 1)))
+    query_params.append(('years', 'INT64', filter_years))
 
-if selected_severities:
-    severities_str = ", ".join([f"'{s}'" for s in selected_severities])
-    where_clauses.append(f"SEVERITY_CATEGORY IN ({severities_str})")
+if filter_severities:
+    where_clauses.append("SEVERITY_CATEGORY IN UNNEST(@severities)")
+    query_params.append(('severities', 'STRING', filter_severities))
 
 where_clause = " AND ".join(where_clauses)
+query_params = tuple(query_params)
+
+# Load each aggregate node, keyed on the filter node it depends on; all
+# missing nodes are served by the same combined query
+filter_node = node_fingerprint(filter_spec)
+try:
+    filtered_data = {
+        kind: cached_node(('aggregate', filter_node, kind), lambda: load_all_filtered(where_clause, query_params)[kind])
+        for kind in RESULT_COLUMNS
+    }
+except Exception as e:
+    st.error(f"Error executing query: {e}")
+    filtered_data = {kind: pd.DataFrame() for kind in RESULT_COLUMNS}
 
 # 1. Top 10 Crash Sites Section
 st.header("Top 10 Crash Sites")
 
-# Load intersection crash data with filters
-intersection_query = f"""
-SELECT 
-    INTASTREETNAME, 
-    INTBSTREETNAME, 
-    COUNT(*) as crash_count,
-    AVG(LATITUDE) as latitude,
-    AVG(LONGITUDE) as longitude
-FROM `datamining-assign.crash_data.processed_crash_data`
-WHERE {where_clause}
-GROUP BY INTASTREETNAME, INTBSTREETNAME
-ORDER BY crash_count DESC
-LIMIT 10
-"""
-
-intersection_data = load_bigquery_data(intersection_query)
+# Get intersection crash data
+intersection_data = filtered_data['intersection']
 
 if not intersection_data.empty:
-    # Create tabs for different views
-    tab1, tab2, tab3 = st.tabs(["Map", "Chart", "Table"])
+    # Label each intersection once for the map, chart and table
+    intersection_data = intersection_data.assign(
+        intersection=intersection_data['INTASTREETNAME'].str.cat(intersection_data['INTBSTREETNAME'], sep=' & ')
+    ).sort_values('crash_count', ascending=False, ignore_index=True)
+    
+    # Create view selector; unlike tabs, only the selected view runs, so
+    # locations are only queried when the map is shown
+    view = st.radio(
+        "Select view:",
+        ["Map", "Chart", "Table"],
+        horizontal=True
+    )
     
-    with tab1:
+    if view == "Map":
         # Create map
         st.subheader("Top 10 Crash Intersections Map")
         
+        # Load lat/long for the top intersections
+        intersections = tuple(intersection_data['INTASTREETNAME'].str.cat(intersection_data['INTBSTREETNAME'], sep='|'))
+        try:
+            location_data = load_intersection_locations(where_clause, query_params, intersections)
+        except Exception as e:
+            st.error(f"Error executing query: {e}")
+            location_data = pd.DataFrame()
+        
+        # Keep the intersections that have lat/long data
+        located = (
+            intersection_data
+            .merge(location_data, on=['INTASTREETNAME', 'INTBSTREETNAME'], how='inner')
+            .dropna(subset=['latitude', 'longitude'])
+            if not location_data.empty else location_data
+        )
+        
         # Check if we have lat/long data
-        if 'latitude' in intersection_data.columns and 'longitude' in intersection_data.columns:
+        if not located.empty:
             # Create a map centered on San Jose
             san_jose_coords = [37.3382, -121.8863]
             m = folium.Map(location=san_jose_coords, zoom_start=12)
             
-            # Add markers for each intersection
-            for idx, row in intersection_data.iterrows():
-                if pd.notna(row['latitude']) and pd.notna(row['longitude']):
-                    popup_text = f"<b>{row['INTASTREETNAME']} & {row['INTBSTREETNAME']}</b><br>Crashes: {row['crash_count']}"
-                    
-                    folium.CircleMarker(
-                        location=[row['latitude'], row['longitude']],
-                        radius=min(15, row['crash_count']/10),  # Scale circle size based on crash count
-                        color='red',
-                        fill=True,
-                        fill_color='red',
-                        fill_opacity=0.7,
-                        popup=folium.Popup(popup_text, max_width=300)
-                    ).add_to(m)
+            # Build all intersection markers as a single GeoJSON layer
+            features = [
+                {
+                    'type': 'Feature',
+                    'geometry': {'type': 'Point', 'coordinates': [float(row.longitude), float(row.latitude)]},
+                    'properties': {
+                        'popup': f"<b>{row.intersection}</b><br>Crashes: {row.crash_count}",
+                        'radius': min(15, float(row.crash_count) / 10)  # Scale circle size based on crash count
+                    }
+                }
+                for row in located.itertuples(index=False)
+            ]
+            
+            folium.GeoJson(
+                {'type': 'FeatureCollection', 'features': features},
+                marker=folium.CircleMarker(color='red', fill=True, fill_color='red', fill_opacity=0.7),
+                style_function=lambda feature: {'radius': feature['properties']['radius']},
+                popup=folium.GeoJsonPopup(fields=['popup'], labels=False, max_width=300)
+            ).add_to(m)
             
             # Display the map
             folium_static(m)
         else:
             st.warning("Map cannot be displayed due to missing location data")
     
-    with tab2:
+    elif view == "Chart":
         # Create and display bar chart
         st.subheader("Top 10 Crash Intersections")
         fig = px.bar(
             intersection_data,
             x='crash_count',
-            y=[f"{row['INTASTREETNAME']} & {row['INTBSTREETNAME']}" for _, row in intersection_data.iterrows()],
+            y='intersection',
             orientation='h',
             title='Top 10 Crash Intersections',
-            labels={'x': 'Number of Crashes', 'y': 'Intersection'},
+            labels={'crash_count': 'Number of Crashes', 'intersection': 'Intersection'},
             color='crash_count',
             color_continuous_scale=px.colors.sequential.Reds
         )
         fig.update_layout(height=500)
         st.plotly_chart(fig, use_container_width=True)
     
-    with tab3:
+    else:  # Table
         # Display as a table
         st.subheader("Top 10 Crash Intersections")
-        st.dataframe(intersection_data[['INTASTREETNAME', 'INTBSTREETNAME', 'crash_count']])
+        st.dataframe(intersection_data[['intersection', 'crash_count']])
 else:
     st.error("Could not load intersection data.")
 
@@ -195,21 +484,17 @@ chart_type = st.radio(
     horizontal=True
 )
 
-# Apply filters to query
-hourly_query = f"""
-SELECT HOUR, COUNT(*) as crash_count
-FROM `datamining-assign.crash_data.processed_crash_data`
-WHERE {where_clause}
-GROUP BY HOUR
-ORDER BY HOUR
-"""
-
-hourly_data = load_bigquery_data(hourly_query)
+# Derive hourly crash data from the fine-grained counts
+fine_data = filtered_data['fine']
+hourly_data = (
+    fine_data.groupby('HOUR', as_index=False)['crash_count'].sum()
+    if not fine_data.empty else pd.DataFrame()
+)
 
 if not hourly_data.empty:
     # Check for missing hours and fill with zeros
-    all_hours = pd.DataFrame({'HOUR': range(0, 24)})
-    hourly_data = pd.merge(all_hours, hourly_data, on='HOUR', how='left').fillna(0)
+    hourly_data = hourly_data.set_index('HOUR').reindex(range(24), fill_value=0).reset_index()
+    hourly_data['crash_count'] = hourly_data['crash_count'].astype('int32')
     
     # Create different chart types based on selection
     if chart_type == "Bar Chart":
@@ -223,12 +508,17 @@ if not hourly_data.empty:
             color_continuous_scale=px.colors.sequential.Viridis
         )
     elif chart_type == "Area Chart":
-        fig = px.area(
-            hourly_data, 
-            x='HOUR', 
-            y='crash_count',
+        # px.area has no WebGL mode, so build the filled trace directly
+        fig = go.Figure(go.Scattergl(
+            x=hourly_data['HOUR'],
+            y=hourly_data['crash_count'],
+            mode='lines',
+            fill='tozeroy'
+        ))
+        fig.update_layout(
             title='Crashes by Hour of Day',
-            labels={'crash_count': 'Number of Crashes', 'HOUR': 'Hour (24-hour format)'}
+            xaxis_title='Hour (24-hour format)',
+            yaxis_title='Number of Crashes'
         )
     else:  # Line Chart
         fig = px.line(
@@ -236,6 +526,7 @@ if not hourly_data.empty:
             x='HOUR', 
             y='crash_count',
             markers=True,
+            render_mode='webgl',
             title='Crashes by Hour of Day',
             labels={'crash_count': 'Number of Crashes', 'HOUR': 'Hour (24-hour format)'}
         )
@@ -270,37 +561,21 @@ else:
 # 3. Day-Hour Heatmap with fixed color scale
 st.header("Day-Hour Crash Heatmap")
 
-# Apply filters to query
-day_hour_query = f"""
-SELECT DAYOFWEEKNAME, HOUR, COUNT(*) as crash_count
-FROM `datamining-assign.crash_data.processed_crash_data`
-WHERE {where_clause}
-GROUP BY DAYOFWEEKNAME, HOUR
-ORDER BY 
-    CASE 
-        WHEN DAYOFWEEKNAME = 'Monday' THEN 1
-        WHEN DAYOFWEEKNAME = 'Tuesday' THEN 2
-        WHEN DAYOFWEEKNAME = 'Wednesday' THEN 3
-        WHEN DAYOFWEEKNAME = 'Thursday' THEN 4
-        WHEN DAYOFWEEKNAME = 'Friday' THEN 5
-        WHEN DAYOFWEEKNAME = 'Saturday' THEN 6
-        WHEN DAYOFWEEKNAME = 'Sunday' THEN 7
-    END,
-    HOUR
-"""
-
-day_hour_data = load_bigquery_data(day_hour_query)
-
-if not day_hour_data.empty:
-    # Create pivot table
-    pivot_data = day_hour_data.pivot(index='DAYOFWEEKNAME', columns='HOUR', values='crash_count')
+if not fine_data.empty:
+    # Create pivot table, summing the fine-grained counts over months
+    pivot_data = fine_data.pivot_table(index='DAYOFWEEKNAME', columns='HOUR', values='crash_count', aggfunc='sum')
     
     # Reorder days of week
     day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
     pivot_data = pivot_data.reindex(day_order)
     
-    # Fill NaN values with 0
+    # Fill NaN values with 0 and store counts as a contiguous int32 block
     pivot_data = pivot_data.fillna(0)
+    pivot_data = pd.DataFrame(
+        np.ascontiguousarray(pivot_data.to_numpy(dtype='int32')),
+        index=pivot_data.index,
+        columns=pivot_data.columns
+    )
     
     # Create heatmap with fixed color scale
     fig = px.imshow(
@@ -323,8 +598,9 @@ if not day_hour_data.empty:
     st.plotly_chart(fig, use_container_width=True)
     
     # Find peak day-hour combination
-    max_idx = pivot_data.stack().idxmax()
-    max_text = f"Peak: {max_idx[0]} at {max_idx[1]}:00 ({int(pivot_data.loc[max_idx[0], max_idx[1]])} crashes)"
+    counts = pivot_data.to_numpy()
+    day_idx, hour_idx = np.unravel_index(counts.argmax(), counts.shape)
+    max_text = f"Peak: {pivot_data.index[day_idx]} at {pivot_data.columns[hour_idx]}:00 ({int(counts[day_idx, hour_idx])} crashes)"
     
     st.info(max_text)
 else:
@@ -333,44 +609,34 @@ else:
 # 4. Monthly Trends without year breakdown
 st.header("Monthly Crash Trends")
 
-# Apply filters to query
-monthly_query = f"""
-SELECT MONTHNAME, COUNT(*) as crash_count
-FROM `datamining-assign.crash_data.processed_crash_data`
-WHERE {where_clause}
-GROUP BY MONTHNAME
-ORDER BY CASE 
-    WHEN MONTHNAME = 'January' THEN 1
-    WHEN MONTHNAME = 'February' THEN 2
-    WHEN MONTHNAME = 'March' THEN 3
-    WHEN MONTHNAME = 'April' THEN 4
-    WHEN MONTHNAME = 'May' THEN 5
-    WHEN MONTHNAME = 'June' THEN 6
-    WHEN MONTHNAME = 'July' THEN 7
-    WHEN MONTHNAME = 'August' THEN 8
-    WHEN MONTHNAME = 'September' THEN 9
-    WHEN MONTHNAME = 'October' THEN 10
-    WHEN MONTHNAME = 'November' THEN 11
-    WHEN MONTHNAME = 'December' THEN 12
-END
-"""
-
-monthly_data = load_bigquery_data(monthly_query)
+# Derive monthly crash data from the fine-grained counts
+monthly_data = (
+    fine_data.groupby('MONTHNAME', as_index=False)['crash_count'].sum()
+    if not fine_data.empty else pd.DataFrame()
+)
 
 if not monthly_data.empty:
+    # Order months chronologically
+    month_order = ['January', 'February', 'March', 'April', 'May', 'June', 
+                   'July', 'August', 'September', 'October', 'November', 'December']
+    monthly_data = monthly_data.sort_values(
+        'MONTHNAME',
+        key=lambda months: months.astype(pd.CategoricalDtype(month_order, ordered=True)),
+        ignore_index=True
+    )
+    
     # Create line chart for overall monthly trend
     fig = px.line(
         monthly_data, 
         x='MONTHNAME', 
         y='crash_count',
         markers=True,
+        render_mode='webgl',
         title='Crashes by Month',
         labels={'crash_count': 'Number of Crashes', 'MONTHNAME': 'Month'}
     )
     
     # Reorder month names
-    month_order = ['January', 'February', 'March', 'April', 'May', 'June', 
-                   'July', 'August', 'September', 'October', 'November', 'December']
     fig.update_xaxes(categoryorder='array', categoryarray=month_order)
     
     # Find and highlight max month
@@ -396,20 +662,16 @@ if not monthly_data.empty:
         'Fall': ['September', 'October', 'November']
     }
     
-    # Create seasonal data
-    seasonal_data = pd.DataFrame({
-        'Season': [],
-        'crash_count': []
-    })
-    
-    for season, months in seasons.items():
-        season_crashes = monthly_data[monthly_data['MONTHNAME'].isin(months)]['crash_count'].sum()
-        seasonal_data = pd.concat([seasonal_data, pd.DataFrame({'Season': [season], 'crash_count': [season_crashes]})])
-    
-    # Order seasons
+    # Aggregate months into seasons
+    month_to_season = {month: season for season, months in seasons.items() for month in months}
     season_order = ['Winter', 'Spring', 'Summer', 'Fall']
-    seasonal_data['Season'] = pd.Categorical(seasonal_data['Season'], categories=season_order, ordered=True)
-    seasonal_data = seasonal_data.sort_values('Season')
+    seasonal_data = (
+        monthly_data
+        .assign(Season=monthly_data['MONTHNAME'].map(month_to_season))
+        .groupby('Season', sort=False, observed=True)['crash_count'].sum()
+        .reindex(season_order, fill_value=0)
+        .reset_index()
+    )
     
     # Create seasonal chart
     fig = px.pie(
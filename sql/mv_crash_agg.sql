@@ -0,0 +1,34 @@
+-- One-time setup: pre-aggregated crash counts used by every chart in app.py.
+-- Latitude/longitude are stored as sums and counts so that the app can
+-- re-aggregate them into exact averages over any filter combination.
+-- Partitioned by crash_year so year filters prune whole partitions.
+-- Partitioning and clustering cannot be added to an existing materialized
+-- view, so the script drops the view first and can be re-run; this also
+-- migrates the unpartitioned view from earlier setups. Queries against the
+-- view fail until the CREATE below finishes.
+DROP MATERIALIZED VIEW IF EXISTS `datamining-assign.crash_data.mv_crash_agg`;
+
+CREATE MATERIALIZED VIEW `datamining-assign.crash_data.mv_crash_agg`
+PARTITION BY DATE_TRUNC(crash_year, YEAR)
+CLUSTER BY SEVERITY_CATEGORY, INTASTREETNAME, INTBSTREETNAME
+OPTIONS (
+    enable_refresh = true,
+    refresh_interval_minutes = 60
+)
+AS
+SELECT
+    DATE_TRUNC(DATE, YEAR) as crash_year,
+    EXTRACT(YEAR FROM DATE) as year,
+    SEVERITY_CATEGORY,
+    INTASTREETNAME,
+    INTBSTREETNAME,
+    DAYOFWEEKNAME,
+    MONTHNAME,
+    HOUR,
+    COUNT(*) as crash_count,
+    SUM(LATITUDE) as latitude_sum,
+    COUNT(LATITUDE) as latitude_count,
+    SUM(LONGITUDE) as longitude_sum,
+    COUNT(LONGITUDE) as longitude_count
+FROM `datamining-assign.crash_data.processed_crash_data_v2`
+GROUP BY crash_year, year, SEVERITY_CATEGORY, INTASTREETNAME, INTBSTREETNAME, DAYOFWEEKNAME, MONTHNAME, HOUR;
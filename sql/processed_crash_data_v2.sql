@@ -0,0 +1,9 @@
+-- One-time setup: copy of the crash data partitioned by month and clustered
+-- on the columns the app filters and groups by. sql/mv_crash_agg.sql and
+-- sql/top_intersections_by_year_sev.sql read from this table.
+CREATE TABLE `datamining-assign.crash_data.processed_crash_data_v2`
+PARTITION BY DATE_TRUNC(DATE, MONTH)
+CLUSTER BY SEVERITY_CATEGORY, INTASTREETNAME, INTBSTREETNAME
+AS
+SELECT *
+FROM `datamining-assign.crash_data.processed_crash_data`;
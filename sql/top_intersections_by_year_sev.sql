@@ -0,0 +1,30 @@
+-- Scheduled query (nightly): per-intersection crash totals for each year and
+-- severity, used by the "Top 10 Crash Sites" section of app.py.
+-- Latitude/longitude are stored as sums and counts so that the app can
+-- re-aggregate them into exact averages over any filter combination.
+-- crash_rank picks each combination's leading intersections as the app's
+-- top-10 candidates; the candidates are then ranked on their full totals.
+CREATE OR REPLACE TABLE `datamining-assign.crash_data.top_intersections_by_year_sev`
+PARTITION BY DATE_TRUNC(crash_year, YEAR)
+CLUSTER BY SEVERITY_CATEGORY, INTASTREETNAME, INTBSTREETNAME
+AS
+WITH intersection_counts AS (
+    SELECT
+        DATE_TRUNC(DATE, YEAR) as crash_year,
+        EXTRACT(YEAR FROM DATE) as year,
+        SEVERITY_CATEGORY,
+        INTASTREETNAME,
+        INTBSTREETNAME,
+        COUNT(*) as crash_count,
+        SUM(LATITUDE) as latitude_sum,
+        COUNT(LATITUDE) as latitude_count,
+        SUM(LONGITUDE) as longitude_sum,
+        COUNT(LONGITUDE) as longitude_count
+    FROM `datamining-assign.crash_data.processed_crash_data_v2`
+    WHERE INTASTREETNAME IS NOT NULL AND INTBSTREETNAME IS NOT NULL
+    GROUP BY crash_year, year, SEVERITY_CATEGORY, INTASTREETNAME, INTBSTREETNAME
+)
+SELECT
+    *,
+    ROW_NUMBER() OVER (PARTITION BY year, SEVERITY_CATEGORY ORDER BY crash_count DESC) as crash_rank
+FROM intersection_counts;